@@ -1,7 +1,6 @@
 import pandas as pd
 import numpy as np
 from faker import Faker
-import random
 
 fake = Faker()
 
@@ -10,53 +9,47 @@ n_jobs = 50
 sites = ["Alpha HQ", "Beta Plant", "Gamma Office", "Delta Site", "Epsilon Plant", "Zeta Plant"]
 services = ["Cleaning", "Maintenance", "Security"]
 start_date = pd.to_datetime("2025-10-01")
+rng = np.random.default_rng()
 
 # ----------------------------
 # Generate client dataset
 # ----------------------------
-client_records = []
-for i in range(n_jobs):
-    record = {
-        "order_id": f"C{i+1:03d}",
-        "job_date": (start_date + pd.Timedelta(days=random.randint(0, 30))).strftime("%Y-%m-%d"),
-        "site": random.choice(sites),
-        "service_type": random.choice(services),
-        "amount": round(random.uniform(1000, 2000), 2),
-    }
-    client_records.append(record)
-
-client_df = pd.DataFrame(client_records)
+client_df = pd.DataFrame({
+    "order_id": [f"C{i+1:03d}" for i in range(n_jobs)],
+    "job_date": (start_date + pd.to_timedelta(rng.integers(0, 31, n_jobs), unit="D")).strftime("%Y-%m-%d"),
+    "site": np.array(sites)[rng.integers(0, len(sites), n_jobs)],
+    "service_type": np.array(services)[rng.integers(0, len(services), n_jobs)],
+    "amount": np.round(rng.uniform(1000, 2000, n_jobs), 2),
+})
 client_df.to_csv("data/client_data.csv", index=False)
 
 # ----------------------------
 # Generate internal dataset with small variations
 # ----------------------------
-internal_records = []
-for i, row in client_df.iterrows():
-    # Sometimes introduce a minor site name difference
-    site_name = row["site"]
-    if random.random() < 0.2:
-        site_name = site_name.replace("HQ", "Headquarters").replace("Office", "Off.")
-
-    # Slight revenue variance
-    revenue = row["amount"] * (1 + random.uniform(-0.02, 0.02))  # ±2%
-    internal_records.append({
-        "job_id": f"I{i+1000}",
-        "job_date": row["job_date"],
-        "site": site_name,
-        "service_type": row["service_type"],
-        "revenue": round(revenue, 2)
-    })
+# Sometimes introduce a minor site name difference
+renamed = rng.random(n_jobs) < 0.2
+variant_sites = client_df["site"].str.replace("HQ", "Headquarters").str.replace("Office", "Off.")
+
+# Slight revenue variance
+revenue = client_df["amount"].to_numpy() * (1 + rng.uniform(-0.02, 0.02, n_jobs))  # ±2%
+
+matched_jobs = pd.DataFrame({
+    "job_id": [f"I{i+1000}" for i in range(n_jobs)],
+    "job_date": client_df["job_date"],
+    "site": variant_sites.where(renamed, client_df["site"]),
+    "service_type": client_df["service_type"],
+    "revenue": np.round(revenue, 2),
+})
 
 # Add some internal-only jobs
-for i in range(5):
-    internal_records.append({
-        "job_id": f"I{2000+i}",
-        "job_date": (start_date + pd.Timedelta(days=random.randint(0,30))).strftime("%Y-%m-%d"),
-        "site": random.choice(sites),
-        "service_type": random.choice(services),
-        "revenue": round(random.uniform(1000,2000),2)
-    })
-
-internal_df = pd.DataFrame(internal_records)
-internal_df.to_csv("data/internal_data.csv", index=False)
\ No newline at end of file
+n_extra = 5
+internal_only_jobs = pd.DataFrame({
+    "job_id": [f"I{2000+i}" for i in range(n_extra)],
+    "job_date": (start_date + pd.to_timedelta(rng.integers(0, 31, n_extra), unit="D")).strftime("%Y-%m-%d"),
+    "site": np.array(sites)[rng.integers(0, len(sites), n_extra)],
+    "service_type": np.array(services)[rng.integers(0, len(services), n_extra)],
+    "revenue": np.round(rng.uniform(1000, 2000, n_extra), 2),
+})
+
+internal_df = pd.concat([matched_jobs, internal_only_jobs], ignore_index=True)
+internal_df.to_csv("data/internal_data.csv", index=False)
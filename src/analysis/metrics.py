@@ -10,19 +10,22 @@ Computes reconciliation metrics, variance thresholds, and anomaly summaries.
 
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
 from utils.logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# Largest whole-dollar amount float32 represents exactly (24-bit significand)
+_FLOAT32_EXACT_DOLLARS = 2 ** 24
+
 def _resolve_revenue_columns(df: pd.DataFrame):
     """Detect client/internal revenue columns after merge."""
     logger.debug("Resolving revenue columns from DataFrame")
     client_col, internal_col = None, None
     for c in df.columns:
-        if "amount" in c or (c.endswith("_client") and "revenue" in c):
+        if ("amount" in c) or (c.endswith("_client") and "revenue" in c):
             client_col = c
-        if "revenue" in c and c.endswith("_internal"):
+        if ("revenue" in c) and c.endswith("_internal"):
             internal_col = c
 
     if client_col is None and "amount" in df.columns:
@@ -34,39 +37,88 @@ def _resolve_revenue_columns(df: pd.DataFrame):
         logger.error(f"Could not detect revenue columns. Available: {df.columns.tolist()}")
         raise KeyError(f"Cannot detect revenue columns. Available: {df.columns.tolist()}")
 
-    logger.info(f"Detected revenue columns → client: {client_col}, internal: {internal_col}")
+    logger.info("Detected revenue columns → client: %s, internal: %s", client_col, internal_col)
     return client_col, internal_col
 
 
+def _rate_change_reasons(pct_variance: np.ndarray, revenue_delta: np.ndarray) -> np.ndarray:
+    """Format rate_change explanations with NumPy string ops (no per-row Python formatting)."""
+    reasons = np.char.add("Client vs Internal revenue differs by ", np.char.mod("%.2f", pct_variance))
+    reasons = np.char.add(reasons, "% ($")
+    return np.char.add(reasons, np.char.add(revenue_delta.astype(str), ")"))
+
+
+def _whole_dollars(values: pd.Series) -> np.ndarray:
+    """
+    Floor a revenue column to whole dollars as a new float64 array.
+    Flooring happens before any float32 cast: cast first, cents can round up
+    into the next dollar from ~$262k (300000.99 -> 300001).
+    """
+    dollars = values.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    return np.floor(dollars, out=dollars)
+
+
+def _variance_kernel(client_rev: np.ndarray, internal_rev: np.ndarray, tolerance: float):
+    """
+    Floor-delta / average-percent variance computed with in-place ufuncs.
+    Both inputs are consumed as scratch space, so only the three outputs are allocated.
+    Returns:
+        revenue_delta, pct_variance, within_tolerance
+    """
+    np.floor(client_rev, out=client_rev)
+    np.floor(internal_rev, out=internal_rev)
+
+    revenue_delta = np.subtract(client_rev, internal_rev)
+    np.abs(revenue_delta, out=revenue_delta)
+
+    avg_sum = np.add(client_rev, internal_rev, out=client_rev)
+    avg_sum *= 0.5
+
+    # Rows where both sides floor to $0 have no variance rather than NaN/inf
+    pct_variance = np.zeros_like(avg_sum)
+    np.divide(revenue_delta, avg_sum, out=pct_variance, where=avg_sum != 0)
+    pct_variance *= 100
+
+    within_tolerance = pct_variance <= tolerance  # inclusive
+    return revenue_delta, pct_variance, within_tolerance
+
+
 def calculate_revenue_variance(matched_df: pd.DataFrame, tolerance: float = 1.0) -> pd.DataFrame:
     """Compute per-row revenue variance and tolerance flag."""
     if matched_df.empty:
         logger.warning("Received empty DataFrame for variance calculation.")
         return matched_df
 
-    logger.info(f"Calculating revenue variance for {len(matched_df)} matched rows (tolerance={tolerance}%)")
+    logger.info("Calculating revenue variance for %d matched rows (tolerance=%s%%)", len(matched_df), tolerance)
     client_col, internal_col = _resolve_revenue_columns(matched_df)
-    revenue_delta = abs(np.floor(matched_df[client_col]) - np.floor(matched_df[internal_col]))
-    avg_sum = (np.floor(matched_df[client_col]) + np.floor(matched_df[internal_col])) / 2
-    pct_variance = (revenue_delta / avg_sum) * 100
-    within_tolerance = pct_variance <= tolerance  # inclusive
-
-    variance_df = matched_df.assign(
-        revenue_delta=revenue_delta,
-        pct_variance=pct_variance,
-        within_tolerance=within_tolerance
-    )
+    # Work on raw array copies floored to whole dollars (ignore cents)
+    client_rev = _whole_dollars(matched_df[client_col])
+    internal_rev = _whole_dollars(matched_df[internal_col])
+    # Whole dollars are exact in float32 up to 2**24; halve the kernel's memory traffic when they fit
+    if not (np.abs(client_rev) > _FLOAT32_EXACT_DOLLARS).any() and not (np.abs(internal_rev) > _FLOAT32_EXACT_DOLLARS).any():
+        client_rev, internal_rev = client_rev.astype(np.float32), internal_rev.astype(np.float32)
+    revenue_delta, pct_variance, within_tolerance = _variance_kernel(client_rev, internal_rev, tolerance)
+
+    # Shallow copy: the new columns are added without re-materializing existing ones
+    variance_df = matched_df.copy(deep=False)
+    variance_df["revenue_delta"] = revenue_delta
+    variance_df["pct_variance"] = pct_variance
+    variance_df["within_tolerance"] = within_tolerance
 
     out_of_tolerance = (~within_tolerance).sum()
     if out_of_tolerance > 0:
-        logger.warning(f"{out_of_tolerance} rows exceed {tolerance:.2f}% tolerance threshold.")
+        logger.warning("%d rows exceed %.2f%% tolerance threshold.", out_of_tolerance, tolerance)
 
     return variance_df
 
 
 def summarize_metrics(matched_df: pd.DataFrame, unmatched_client: pd.DataFrame,
-                      unmatched_internal: pd.DataFrame, tolerance: float = 1.0) -> Dict:
-    """Summarize reconciliation KPIs for dashboard."""
+                      unmatched_internal: pd.DataFrame, tolerance: float = 1.0,
+                      variance_df: Optional[pd.DataFrame] = None) -> Dict:
+    """
+    Summarize reconciliation KPIs for dashboard.
+    Pass a precomputed `variance_df` (from calculate_revenue_variance) to skip recomputing it.
+    """
     logger.info("Generating summary metrics for reconciliation results.")
     if matched_df.empty:
         logger.warning("No matched records — returning empty metrics summary.")
@@ -83,64 +135,86 @@ def summarize_metrics(matched_df: pd.DataFrame, unmatched_client: pd.DataFrame,
         }
 
     total_jobs = max(len(matched_df) + len(unmatched_client), len(matched_df) + len(unmatched_internal))
-    variance_df = calculate_revenue_variance(matched_df, tolerance=tolerance)
-    avg_variance = variance_df["pct_variance"].mean()
-    within_tolerance = variance_df["within_tolerance"].mean() * 100
+    if variance_df is None:
+        variance_df = calculate_revenue_variance(matched_df, tolerance=tolerance)
+    # Reduce the raw arrays directly; NaN variances (missing revenue) are skipped like Series.mean/sum
+    pct_variance = variance_df["pct_variance"].to_numpy()
+    revenue_delta = variance_df["revenue_delta"].to_numpy()
+    within_tolerance = variance_df["within_tolerance"].to_numpy()
+    valid = ~np.isnan(pct_variance)
+    avg_variance = pct_variance[valid].mean(dtype=np.float64) if valid.any() else np.nan
 
     metrics = {
         "total_jobs": total_jobs,
         "matched_jobs": len(matched_df),
         "match_rate": round(len(matched_df)/total_jobs*100,2),
-        "avg_variance_pct": round(avg_variance,2),
-        "within_tolerance_pct": round(within_tolerance,2),
+        "avg_variance_pct": round(float(avg_variance),2),
+        "within_tolerance_pct": round(100.0 * int(within_tolerance.sum()) / within_tolerance.size,2),
         "unmatched_client_jobs": len(unmatched_client),
         "unmatched_internal_jobs": len(unmatched_internal),
-        "total_variance_amount": round(variance_df["revenue_delta"].sum(),2)
+        "total_variance_amount": round(float(revenue_delta[valid].sum(dtype=np.float64)),2)
     }
 
     logger.info(
-        f"Summary metrics → Match rate: {metrics['match_rate']}%, "
-        f"Avg variance: {metrics['avg_variance_pct']}%, "
-        f"Unmatched: C={metrics['unmatched_client_jobs']} / I={metrics['unmatched_internal_jobs']}"
+        "Summary metrics → Match rate: %s%%, Avg variance: %s%%, Unmatched: C=%d / I=%d",
+        metrics["match_rate"], metrics["avg_variance_pct"],
+        metrics["unmatched_client_jobs"], metrics["unmatched_internal_jobs"],
     )
 
     return metrics
 
 
-def detect_anomalies(matched_df: pd.DataFrame, tolerance: float = 1.0) -> pd.DataFrame:
-    """Detect anomalies and add detailed explanation."""
+def detect_anomalies(matched_df: pd.DataFrame, tolerance: float = 1.0,
+                     variance_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Detect anomalies and add detailed explanation.
+    Pass a precomputed `variance_df` (from calculate_revenue_variance) to skip recomputing it.
+    """
     logger.info("Detecting anomalies in matched records.")
     if matched_df.empty:
         logger.warning("No data available for anomaly detection.")
         return matched_df
 
-    df = calculate_revenue_variance(matched_df, tolerance=tolerance)
+    if variance_df is None:
+        df = calculate_revenue_variance(matched_df, tolerance=tolerance)
+    else:
+        df = variance_df.copy()
     df["anomaly"] = None
     df["anomaly_reason"] = None
 
-    # Flags
+    # Flags — each block only runs when its mask selects at least one row
     rate_change_mask = df["pct_variance"] > tolerance
-    duplicate_mask = df.duplicated(subset=["job_date", "site"], keep=False)
-    missing_client_mask = df.get("order_id_client", pd.Series([False]*len(df))).isna()
-    missing_internal_mask = df.get("job_id_internal", pd.Series([False]*len(df))).isna()
-
-    df.loc[rate_change_mask, "anomaly"] = "rate_change"
-    df.loc[rate_change_mask, "anomaly_reason"] = df.apply(
-        lambda r: f"Client vs Internal revenue differs by {r['pct_variance']:.2f}% (${r['revenue_delta']})", axis=1
-    )
-
-    df.loc[duplicate_mask, "anomaly"] = "duplicate"
-    df.loc[duplicate_mask, "anomaly_reason"] = "Multiple entries for same site/date"
-
-    df.loc[missing_client_mask, "anomaly"] = "missing_job"
-    df.loc[missing_client_mask, "anomaly_reason"] = "Job missing from client data"
-
-    df.loc[missing_internal_mask, "anomaly"] = "new_job"
-    df.loc[missing_internal_mask, "anomaly_reason"] = "Job present in internal ledger but missing from client data"
+    if rate_change_mask.any():
+        df.loc[rate_change_mask, "anomaly"] = "rate_change"
+        df.loc[rate_change_mask, "anomaly_reason"] = _rate_change_reasons(
+            df.loc[rate_change_mask, "pct_variance"].to_numpy(),
+            df.loc[rate_change_mask, "revenue_delta"].to_numpy(),
+        )
+
+    # One hash pass gives both the duplicate flag and the group size for the reason text
+    group_size = df.groupby(["job_date", "site"], sort=False, dropna=False, observed=True)["job_date"].transform("size")
+    duplicate_mask = group_size > 1
+    if duplicate_mask.any():
+        df.loc[duplicate_mask, "anomaly"] = "duplicate"
+        df.loc[duplicate_mask, "anomaly_reason"] = (
+            "Multiple entries for same site/date (" + group_size[duplicate_mask].astype(str) + " rows)"
+        )
+
+    if "order_id_client" in df.columns:
+        missing_client_mask = df["order_id_client"].isna()
+        if missing_client_mask.any():
+            df.loc[missing_client_mask, "anomaly"] = "missing_job"
+            df.loc[missing_client_mask, "anomaly_reason"] = "Job missing from client data"
+
+    if "job_id_internal" in df.columns:
+        missing_internal_mask = df["job_id_internal"].isna()
+        if missing_internal_mask.any():
+            df.loc[missing_internal_mask, "anomaly"] = "new_job"
+            df.loc[missing_internal_mask, "anomaly_reason"] = "Job present in internal ledger but missing from client data"
 
     anomaly_counts = df["anomaly"].value_counts(dropna=True).to_dict()
     if anomaly_counts:
-        logger.warning(f"Detected anomalies: {anomaly_counts}")
+        logger.warning("Detected anomalies: %s", anomaly_counts)
     else:
         logger.info("No anomalies detected within the given tolerance.")
 
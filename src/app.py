@@ -13,12 +13,13 @@ Author: AI Solutions Analyst Assessment (2025)
 
 import streamlit as st
 import pandas as pd
+import io
 import os
 import time
 import logging
 from matching.matcher import reconcile
 from analysis.metrics import summarize_metrics, detect_anomalies, calculate_revenue_variance
-from data.fetcher import load_client_data, load_internal_data
+from data.fetcher import CLIENT_API_URL, LEDGER_API_URL, load_client_data, load_internal_data, source_version
 from data.normalizer import normalize_dataframe
 
 from utils.logger_config import get_logger
@@ -26,6 +27,49 @@ from utils.logger_config import get_logger
 logger = get_logger(__name__)
 
 
+# ---------------------------------------------------------------------
+# Cached Pipeline Steps
+# ---------------------------------------------------------------------
+# Streamlit reruns the whole script on every widget interaction, so the
+# pipeline is memoized on its inputs and only recomputed when they change.
+@st.cache_data(show_spinner=False)
+def _cached_load(client_version, ledger_version):
+    """
+    Fetch and normalize the sample client and ledger datasets.
+    The source files' (mtime_ns, size) versions key the cache, so a rewritten export is reloaded.
+    """
+    return normalize_dataframe(load_client_data()), normalize_dataframe(load_internal_data())
+
+
+@st.cache_data(show_spinner=False)
+def _cached_read_csv(content: bytes) -> pd.DataFrame:
+    """Parse an uploaded CSV, keyed on its raw bytes."""
+    return pd.read_csv(io.BytesIO(content))
+
+
+@st.cache_data(show_spinner=False)
+def _cached_reconcile(client_df: pd.DataFrame, ledger_df: pd.DataFrame):
+    """Run deterministic + fuzzy reconciliation."""
+    return reconcile(client_df, ledger_df)
+
+
+@st.cache_data(show_spinner=False)
+def _cached_analysis(matched_df: pd.DataFrame, unmatched_client: pd.DataFrame,
+                     unmatched_internal: pd.DataFrame, tolerance: float):
+    """
+    Run variance -> metrics -> anomaly classification as one cached step.
+    The variance frame is computed once and shared, so the whole chain is
+    hashed, evaluated and materialized once per (results, tolerance) pair.
+    Returns:
+        variance_df, metrics, anomalies_df
+    """
+    variance_df = calculate_revenue_variance(matched_df, tolerance=tolerance)
+    metrics = summarize_metrics(matched_df, unmatched_client, unmatched_internal,
+                                tolerance=tolerance, variance_df=variance_df)
+    anomalies_df = detect_anomalies(matched_df, tolerance=tolerance, variance_df=variance_df)
+    return variance_df, metrics, anomalies_df
+
+
 # ---------------------------------------------------------------------
 # Streamlit Setup
 # ---------------------------------------------------------------------
@@ -52,8 +96,7 @@ start_load_time = time.time()
 try:
     if auto_load:
         logger.info("Loading sample datasets via fetcher...")
-        client_df = normalize_dataframe(load_client_data())
-        ledger_df = normalize_dataframe(load_internal_data())
+        client_df, ledger_df = _cached_load(source_version(CLIENT_API_URL), source_version(LEDGER_API_URL))
         logger.info(f"Loaded sample data: client={len(client_df)} rows, ledger={len(ledger_df)} rows")
     else:
         st.sidebar.markdown("### Upload CSVs")
@@ -61,8 +104,8 @@ try:
         ledger_file = st.sidebar.file_uploader("Internal ledger (CSV)", type=["csv"])
 
         if client_file and ledger_file:
-            client_df = pd.read_csv(client_file)
-            ledger_df = pd.read_csv(ledger_file)
+            client_df = _cached_read_csv(client_file.getvalue())
+            ledger_df = _cached_read_csv(ledger_file.getvalue())
             logger.info(f"Loaded uploaded CSVs: client={len(client_df)} rows, ledger={len(ledger_df)} rows")
         else:
             st.warning("Please upload both client and ledger files or enable sample data.")
@@ -96,7 +139,7 @@ logger.info("Displayed raw data preview in expander section.")
 # ---------------------------------------------------------------------
 try:
     logger.info("Starting deterministic + fuzzy reconciliation process...")
-    matched_df, unmatched_client, unmatched_internal = reconcile(client_df, ledger_df)
+    matched_df, unmatched_client, unmatched_internal = _cached_reconcile(client_df, ledger_df)
     logger.info(f"Reconciliation complete — matched={len(matched_df)}, "
                 f"unmatched_client={len(unmatched_client)}, unmatched_internal={len(unmatched_internal)}")
 
@@ -111,7 +154,7 @@ except ValueError as e:
 logger.info("Computing metrics and variance summary...")
 st.header("Metrics & Variance Summary")
 
-metrics = summarize_metrics(matched_df, unmatched_client, unmatched_internal, tolerance=tolerance)
+variance_df, metrics, anomalies_df = _cached_analysis(matched_df, unmatched_client, unmatched_internal, tolerance)
 logger.info(f"Metrics calculated: {metrics}")
 
 cols = st.columns(3)
@@ -127,15 +170,13 @@ cols[2].metric("Total Difference Variance", f"${metrics['total_variance_amount']
 # ---------------------------------------------------------------------
 # Tolerance Enforcement
 # ---------------------------------------------------------------------
-matched_df = calculate_revenue_variance(matched_df, tolerance=tolerance)
-exceptions_df = matched_df[~matched_df["within_tolerance"]]
+exceptions_df = variance_df[~variance_df["within_tolerance"]]
 
 if not exceptions_df.empty:
     logger.warning(f"{len(exceptions_df)} matched rows exceed {tolerance:.1f}% tolerance.")
     st.error(f"{len(exceptions_df)} matched rows exceed {tolerance:.1f}% variance tolerance!")
     st.header("Anomaly Classification & Review")
 
-    anomalies_df = detect_anomalies(matched_df, tolerance=tolerance)
     anomalies_df["review_status"] = "pending"
     logger.info(f"Detected anomalies: {len(anomalies_df)} rows flagged.")
 
@@ -7,9 +7,12 @@ Responsibilities:
  - Normalize free-text fields (e.g., site names)
  - Standardize service type formatting
  - Ensure valid job dates
+ - Store site and service type as categoricals
  - Log normalization steps and data quality issues
 """
 
+import re
+import logging
 import pandas as pd
 
 from utils.logger_config import get_logger
@@ -17,6 +20,23 @@ from utils.logger_config import get_logger
 logger = get_logger(__name__)
 
 
+ADDRESS_MAPPING = {
+    "st.": "street",
+    "rd.": "road",
+    "ave": "avenue",
+    "blvd": "boulevard",
+    "hwy": "highway",
+    "plz": "plaza"
+}
+
+# All abbreviations in one alternation, so expansion is a single regex pass
+_ABBR_RE = re.compile("|".join(map(re.escape, ADDRESS_MAPPING)))
+
+
+def _expand_abbreviation(match: re.Match) -> str:
+    """Regex replacement callback: abbreviation -> full word."""
+    return ADDRESS_MAPPING[match.group(0)]
+
 
 # ---------------------------------------------------------------------
 # Normalization Helpers
@@ -26,24 +46,11 @@ def _normalize_text(value: str) -> str:
     if not isinstance(value, str):
         return ""
     original = value
-    value = value.strip().lower()
-
-    address_mapping = {
-        "st.": "street",
-        "rd.": "road",
-        "ave": "avenue",
-        "blvd": "boulevard",
-        "hwy": "highway",
-        "plz": "plaza"
-    }
-
-    for abbr, full in address_mapping.items():
-        value = value.replace(abbr, full)
+    # One regex pass expands every abbreviation (same rules as `_normalize_site_series`)
+    normalized = _ABBR_RE.sub(_expand_abbreviation, value.strip().lower()).title()
 
-    normalized = value.title()
-
-    if original != normalized:
-        logger.debug(f"Normalized site text: '{original}' → '{normalized}'")
+    if original != normalized and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Normalized site text: '%s' → '%s'", original, normalized)
 
     return normalized
 
@@ -55,12 +62,36 @@ def _normalize_service_type(value: str) -> str:
     original = value
     normalized = value.strip().upper()
 
-    if original != normalized:
-        logger.debug(f"Normalized service type: '{original}' → '{normalized}'")
+    if original != normalized and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Normalized service type: '%s' → '%s'", original, normalized)
 
     return normalized
 
 
+def _normalize_site_series(sites: pd.Series) -> pd.Series:
+    """Vectorized `_normalize_text` over a column using the pandas `.str` accessor."""
+    try:
+        normalized = (
+            sites.str.strip()
+            .str.lower()
+            .str.replace(_ABBR_RE, _expand_abbreviation, regex=True)
+            .str.title()
+        )
+    except AttributeError:  # no string values, so `.str` is unavailable
+        return sites.apply(_normalize_text)
+    # Non-string cells come back as NaN; match the helper's "" for them
+    return normalized.fillna("")
+
+
+def _normalize_service_type_series(service_types: pd.Series) -> pd.Series:
+    """Vectorized `_normalize_service_type` over a column using the pandas `.str` accessor."""
+    try:
+        normalized = service_types.str.strip().str.upper()
+    except AttributeError:  # no string values, so `.str` is unavailable
+        return service_types.apply(_normalize_service_type)
+    return normalized.fillna("")
+
+
 # ---------------------------------------------------------------------
 # DataFrame Normalization
 # ---------------------------------------------------------------------
@@ -70,7 +101,7 @@ def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         logger.warning("Received empty DataFrame for normalization.")
         return df
 
-    logger.info(f"Starting normalization for {len(df)} rows...")
+    logger.info("Starting normalization for %d rows...", len(df))
 
     df = df.copy()
 
@@ -78,20 +109,20 @@ def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     required_cols = ["job_date", "site", "service_type"]
     missing_cols = [c for c in required_cols if c not in df.columns]
     if missing_cols:
-        logger.error(f"Missing required columns: {missing_cols}")
+        logger.error("Missing required columns: %s", missing_cols)
         raise KeyError(f"Missing columns: {missing_cols}")
 
     # Normalize job_date
     df["job_date"] = pd.to_datetime(df["job_date"], errors="coerce")
     invalid_dates = df["job_date"].isna().sum()
     if invalid_dates > 0:
-        logger.warning(f"{invalid_dates} invalid or missing 'job_date' entries coerced to NaT")
+        logger.warning("%d invalid or missing 'job_date' entries coerced to NaT", invalid_dates)
 
-    # Normalize text columns
-    df["site"] = df["site"].apply(_normalize_text)
-    df["service_type"] = df["service_type"].apply(_normalize_service_type)
+    # Normalize text columns; both are low-cardinality, so store them as categoricals
+    df["site"] = _normalize_site_series(df["site"]).astype("category")
+    df["service_type"] = _normalize_service_type_series(df["service_type"]).astype("category")
 
     logger.info(
-        f"Normalization complete — {len(df)} records processed, {invalid_dates} invalid dates found."
+        "Normalization complete — %d records processed, %d invalid dates found.", len(df), invalid_dates
     )
     return df
@@ -9,32 +9,106 @@ Performs deterministic and fuzzy matching between client and internal job record
 - Identifies unmatched records
 """
 
+import multiprocessing as mp
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from itertools import repeat
+from pandas.api.types import union_categoricals
 from difflib import SequenceMatcher
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
 # matcher.py
 from utils.logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# Below this many unscored value pairs, process start-up costs more than it saves
+PARALLEL_MIN_PAIRS = 5000
 
 
 # ---------------------------------------------------------------------
 # Utilities
 # ---------------------------------------------------------------------
 def _similarity(a: str, b: str) -> float:
-    """Return a similarity ratio between 0 and 1 for fuzzy string comparison."""
+    """
+    Return a similarity ratio between 0 and 1 for fuzzy string comparison.
+    Scalar reference for the batched scorers (`_ratio_many`, `_pair_similarity`);
+    fuzzy_match itself does not call it.
+    """
     if not a or not b:
         return 0.0
     return SequenceMatcher(None, str(a).lower().strip(), str(b).lower().strip()).ratio()
 
 
+def _ratio_many(texts, b_text: str, floor: float = 0.0) -> List[float]:
+    """
+    SequenceMatcher ratio of each already-normalized text in `texts` against `b_text`.
+    `b_text` is loaded once as SequenceMatcher's second sequence, so its junk/index
+    tables are built a single time instead of once per pair.
+
+    With `floor` > 0, pairs whose cheap upper bound (real_quick_ratio /
+    quick_ratio) is already below `floor` skip the full ratio and score that
+    bound instead; every score >= `floor` is still exact.
+    """
+    matcher = SequenceMatcher(None, "", b_text)
+    scores = []
+    for text in texts:
+        matcher.set_seq1(text)
+        if floor > 0:
+            bound = matcher.real_quick_ratio()
+            if bound < floor:
+                scores.append(bound)
+                continue
+            bound = matcher.quick_ratio()
+            if bound < floor:
+                scores.append(bound)
+                continue
+        scores.append(matcher.ratio())
+    return scores
+
+
+@lru_cache(maxsize=65536, typed=True)
 def _normalize(s: str) -> str:
-    """Normalize string for matching (lowercase, strip)."""
+    """Normalize string for matching (lowercase, strip). Memoized per value."""
     return str(s).lower().strip() if isinstance(s, str) else ""
 
 
+def _align_categories(client_df: pd.DataFrame, internal_df: pd.DataFrame,
+                      columns: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Cast shared text columns on both sides to one categorical dtype.
+    With identical categories, merges compare integer codes instead of strings.
+    Returns new frames; untouched columns are shared with the inputs.
+
+    Columns are left as they are when the two sides infer different category
+    dtypes (e.g. an all-empty float column against text), so the merge rejects
+    them with a ValueError, or when they hold None: the cast would turn None
+    (scored as empty) into NaN (compared as the text "nan") for fuzzy matching.
+    """
+    dtypes = {}
+    for col in columns:
+        if _has_none(client_df[col]) or _has_none(internal_df[col]):
+            continue
+        client_cat, internal_cat = pd.Categorical(client_df[col]), pd.Categorical(internal_df[col])
+        if client_cat.categories.dtype != internal_cat.categories.dtype:
+            logger.debug("Not aligning %s: categories are %s vs %s", col,
+                         client_cat.categories.dtype, internal_cat.categories.dtype)
+            continue
+        categories = union_categoricals([client_cat, internal_cat], ignore_order=True).categories
+        dtypes[col] = pd.CategoricalDtype(categories)
+    return client_df.astype(dtypes), internal_df.astype(dtypes)
+
+
+def _has_none(values: pd.Series) -> bool:
+    """Whether an object column holds None (only its missing entries are inspected)."""
+    if values.dtype != object:
+        return False
+    return any(v is None for v in values[values.isna()])
+
+
 # ---------------------------------------------------------------------
 # Matching Logic
 # ---------------------------------------------------------------------
@@ -43,9 +117,25 @@ def get_unmatched(df: pd.DataFrame, matched_df: pd.DataFrame, join_keys: List[st
     if matched_df.empty:
         logger.debug("No matched records found; all records are unmatched.")
         return df.copy()
-    unmatched = df.merge(matched_df[join_keys], on=join_keys, how="left", indicator=True)
-    unmatched = unmatched[unmatched["_merge"] == "left_only"].drop(columns=["_merge"])
-    return unmatched
+    # Anti-join: one hash-set membership pass over the key tuples, no merge output
+    if len(join_keys) == 1:
+        key = join_keys[0]
+        matched_mask = df[key].isin(matched_df[key])
+    else:
+        matched_mask = pd.MultiIndex.from_frame(df[join_keys]).isin(pd.MultiIndex.from_frame(matched_df[join_keys]))
+    return df[~matched_mask].reset_index(drop=True)
+
+
+def _unmatched_by_id(df: pd.DataFrame, all_matches: pd.DataFrame, id_col: str) -> pd.DataFrame:
+    """
+    Rows of df whose id does not appear in all_matches (one isin pass over the unique ids).
+    Raises ValueError when either frame lacks the id column: without ids, matched
+    rows cannot be told apart from unmatched ones.
+    """
+    if id_col not in df.columns or id_col not in all_matches.columns:
+        raise ValueError(f"Cannot determine unmatched records: '{id_col}' column is missing.")
+    matched_ids = all_matches[id_col].dropna().unique()
+    return df[~df[id_col].isin(matched_ids)].reset_index(drop=True)
 
 
 def deterministic_match(client_df: pd.DataFrame, internal_df: pd.DataFrame, join_keys: List[str]) -> pd.DataFrame:
@@ -57,7 +147,7 @@ def deterministic_match(client_df: pd.DataFrame, internal_df: pd.DataFrame, join
             f"internal cols: {internal_df.columns.tolist()}"
         )
 
-    logger.info(f"Performing deterministic match on keys: {join_keys}")
+    logger.info("Performing deterministic match on keys: %s", join_keys)
     matched = pd.merge(
         client_df,
         internal_df,
@@ -68,89 +158,245 @@ def deterministic_match(client_df: pd.DataFrame, internal_df: pd.DataFrame, join
     matched["confidence"] = 1.0
     matched["match_type"] = "deterministic"
 
-    logger.info(f"Deterministic matches found: {len(matched)}")
+    logger.info("Deterministic matches found: %d", len(matched))
     return matched
 
 
-def fuzzy_match(client_df: pd.DataFrame, internal_df: pd.DataFrame, threshold: float = 0.8) -> pd.DataFrame:
+def _column_values(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Return a column as a NumPy array, or empty strings when the column is absent."""
+    if column in df.columns:
+        return df[column].to_numpy()
+    return np.full(len(df), "", dtype=object)
+
+
+def _block_keys(client_values: pd.Series, internal_values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Perform fuzzy matching on site names when deterministic match fails.
-    Returns best matches above threshold with confidence scores.
+    Encode a blocking column (e.g. job_date) on both sides as shared int32 keys
+    (-1 for missing values). The candidate join then hashes 4-byte integers
+    instead of datetimes or strings.
     """
-    logger.info(f"Starting fuzzy matching (threshold={threshold})...")
-    if client_df.empty or internal_df.empty:
-        logger.warning("Fuzzy matching skipped: one or both DataFrames are empty.")
-        return pd.DataFrame()
+    codes, _ = pd.factorize(pd.concat([client_values, internal_values], ignore_index=True))
+    codes = codes.astype(np.int32)
+    return codes[:len(client_values)], codes[len(client_values):]
 
-    results = []
-    client_df = client_df.copy()
-    internal_df = internal_df.copy()
 
-    # Pre-group by date to avoid O(n²) comparisons across unrelated dates
-    grouped_internal = internal_df.groupby("job_date")
+def _match_text(values: np.ndarray) -> np.ndarray:
+    """Text `_similarity` compares for each value; None where the value is falsy (scores 0)."""
+    return np.array([str(v).lower().strip() if v else None for v in values], dtype=object)
 
-    for _, c_row in client_df.iterrows():
-        job_date = c_row.get("job_date")
-        if pd.isna(job_date) or job_date not in grouped_internal.groups:
-            continue
 
-        best_score = 0.0
-        best_match = None
-        for _, i_row in grouped_internal.get_group(job_date).iterrows():
-            name_sim = _similarity(c_row.get("site"), i_row.get("site"))
-            type_sim = _similarity(c_row.get("service_type", ""), i_row.get("service_type", ""))
-            score = (name_sim + type_sim) / 2
+def _factorize_text(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer codes per row and the `_match_text` of each unique value.
+    factorize folds None into NaN, but `_similarity` scores None as empty
+    while NaN compares as the text "nan", so None rows get their own code.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    text = _match_text(np.asarray(uniques, dtype=object))
+    if values.dtype == object:
+        is_none = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+        if is_none.any():
+            codes = np.where(is_none, len(text), codes)
+            text = np.append(text, np.array([None], dtype=object))
+    return codes, text
+
+
+def _similarity_table(client_values: np.ndarray, internal_values: np.ndarray):
+    """
+    Factorize client/internal values into integer codes for `_pair_similarity`.
+    Each unique value is lowercased/stripped once here, so scoring never
+    re-normalizes per pair.
+    Returns:
+        client_codes, internal_codes, (client_text, internal_text)
+    """
+    c_codes, c_text = _factorize_text(client_values)
+    i_codes, i_text = _factorize_text(internal_values)
+    return c_codes, i_codes, (c_text, i_text)
+
 
-            if score > best_score:
-                best_score = score
-                best_match = i_row
+def _scoring_pool(workers: Optional[int]):
+    """
+    A process pool for `_pair_similarity`, or a null context when `workers` <= 1.
+    Workers start lazily on first use, and via forkserver/spawn rather than fork,
+    since the logging QueueListener makes this a multi-threaded process.
+    """
+    if not workers or workers <= 1:
+        return nullcontext()
+    method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(method))
 
-        if best_match is not None and best_score >= threshold:
-            combined = {**c_row.to_dict(), **best_match.to_dict()}
-            combined["confidence"] = round(best_score, 2)
-            combined["match_type"] = "fuzzy"
-            results.append(combined)
 
-    matched_count = len(results)
-    logger.info(f"Fuzzy matches found: {matched_count}")
-    return pd.DataFrame(results)
+def _pair_similarity(table, c_codes: np.ndarray, i_codes: np.ndarray, floor: float = 0.0,
+                     workers: Optional[int] = None, executor: Optional[ProcessPoolExecutor] = None) -> np.ndarray:
+    """
+    Return the similarity of each (c_codes[k], i_codes[k]) pair.
+    Each distinct value pair is scored once and looked up for every row pair
+    sharing it; scores are only stored for the distinct pairs actually requested.
+    Scores below `floor` may be upper bounds (see `_ratio_many`).
+    With `workers` > 1, large batches of unscored pairs are spread over processes,
+    using `executor` when given (see `_scoring_pool`) or a pool for this call otherwise.
+    """
+    c_text, i_text = table
+    if len(c_codes) == 0:
+        return np.empty(0)
+    # One int64 key per (client, internal) code pair; unique() dedups them
+    keys, inverse = np.unique(c_codes.astype(np.int64) * len(i_text) + i_codes, return_inverse=True)
+    pair_c, pair_i = np.divmod(keys, len(i_text))
+    scores = np.zeros(len(keys))
+
+    # Vectorized fast path: empty values score 0 and identical text scores 1,
+    # without running SequenceMatcher
+    a, b = c_text[pair_c], i_text[pair_i]
+    empty = (a == None) | (b == None)  # noqa: E711 (elementwise on object arrays)
+    same = ~empty & (a == b)
+    scores[same] = 1.0
+    todo = np.flatnonzero(~(empty | same))
+
+    # Fill grouped by internal value so each one is indexed once; the text was
+    # normalized once per unique value, so the scorer works on it directly.
+    # One sort groups the pairs, instead of a scan over all pairs per value
+    todo = todo[np.argsort(pair_i[todo], kind="stable")]
+    i_todo, starts = np.unique(pair_i[todo], return_index=True)
+    groups = np.split(todo, starts[1:])
+    texts = [c_text[pair_c[group]] for group in groups]
+    if workers and workers > 1 and len(i_todo) > 1 and len(todo) >= PARALLEL_MIN_PAIRS:
+        # Batch several internal values per task to cut IPC round trips
+        chunksize = len(i_todo) // (workers * 4) or 1
+        with (nullcontext(executor) if executor is not None else _scoring_pool(workers)) as pool:
+            filled = list(pool.map(_ratio_many, texts, i_text[i_todo], repeat(floor), chunksize=chunksize))
+    else:
+        filled = map(_ratio_many, texts, i_text[i_todo], repeat(floor))
+    for group, group_scores in zip(groups, filled):
+        scores[group] = group_scores
+    return scores[inverse.reshape(-1)]
+
+
+def _combine_matches(client_rows: pd.DataFrame, internal_rows: pd.DataFrame, scores: np.ndarray) -> pd.DataFrame:
+    """
+    Place matched client/internal rows side by side.
+    Shared columns take the internal value, as when merging the two row dicts.
+    """
+    combined = client_rows.reset_index(drop=True)
+    internal_rows = internal_rows.reset_index(drop=True)
+    for col in internal_rows.columns:
+        combined[col] = internal_rows[col]
+    combined["confidence"] = np.array([round(float(score), 2) for score in scores], dtype=np.float64)
+    combined["match_type"] = "fuzzy"
+    return combined
 
 
-def reconcile(client_df: pd.DataFrame, internal_df: pd.DataFrame, threshold: float = 0.8) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def fuzzy_match(client_df: pd.DataFrame, internal_df: pd.DataFrame, threshold: float = 0.8,
+                workers: Optional[int] = None, block_on: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Perform fuzzy matching on site names when deterministic match fails.
+    Returns best matches above threshold with confidence scores; with no
+    matches (or an empty input) the result is an empty frame with the same columns.
+
+    Candidates are (client, internal) pairs that agree on every `block_on`
+    column (default: job_date), found with one join; the best internal row is
+    picked per client row.
+    Similarities are computed once per distinct value pair (via factorized
+    codes) and looked up for every row pair that shares those values.
+    Pass `workers` > 1 to score large batches of value pairs in parallel processes.
+    """
+    logger.info("Starting fuzzy matching (threshold=%s)...", threshold)
+    if client_df.empty or internal_df.empty:
+        logger.warning("Fuzzy matching skipped: one or both DataFrames are empty.")
+        return _combine_matches(client_df.iloc[:0], internal_df.iloc[:0], np.empty(0))
+
+    # Score distinct site / service type values rather than every row pair
+    c_sites, i_sites, site_table = _similarity_table(
+        _column_values(client_df, "site"), _column_values(internal_df, "site"))
+    c_types, i_types, type_table = _similarity_table(
+        _column_values(client_df, "service_type"), _column_values(internal_df, "service_type"))
+
+    # Hash-join on the blocking columns materializes exactly the candidate pairs
+    # (missing keys never match, so those rows are dropped before joining)
+    block_on = block_on or ["job_date"]
+    c_keys, i_keys = {"ci": np.arange(len(client_df))}, {"ii": np.arange(len(internal_df))}
+    key_names = [f"key_{n}" for n in range(len(block_on))]
+    for name, col in zip(key_names, block_on):
+        c_keys[name], i_keys[name] = _block_keys(client_df[col], internal_df[col])
+    c_keys, i_keys = pd.DataFrame(c_keys), pd.DataFrame(i_keys)
+    candidates = c_keys[(c_keys[key_names] >= 0).all(axis=1)].merge(
+        i_keys[(i_keys[key_names] >= 0).all(axis=1)], on=key_names
+    )
+    ci = candidates["ci"].to_numpy()
+    ii = candidates["ii"].to_numpy()
+    # The score averages two ratios <= 1, so a pair can only reach the threshold
+    # if each ratio is >= 2 * threshold - 1; pairs bounded below that are pruned
+    # (with a small margin so float rounding cannot lift a pruned pair to the threshold)
+    floor = max(0.0, 2 * threshold - 1 - 1e-9)
+    # One pool serves both the site and service type scoring
+    with _scoring_pool(workers) as executor:
+        scores = (
+            _pair_similarity(site_table, c_sites[ci], i_sites[ii], floor, workers, executor)
+            + _pair_similarity(type_table, c_types[ci], i_types[ii], floor, workers, executor)
+        ) / 2
+
+    # Best candidate per client row; ties go to the first internal row
+    order = np.lexsort((ii, -scores, ci))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ci[order][1:] != ci[order][:-1]
+    best = order[first]
+    best = best[(scores[best] > 0) & (scores[best] >= threshold)]
+
+    if len(best) == 0:
+        logger.info("Fuzzy matches found: 0")
+        return _combine_matches(client_df.iloc[:0], internal_df.iloc[:0], np.empty(0))
+
+    # Build the output once, in client row order (best is sorted by client position)
+    results = _combine_matches(client_df.iloc[ci[best]], internal_df.iloc[ii[best]], scores[best])
+
+    logger.info("Fuzzy matches found: %d", len(results))
+    return results
+
+
+def reconcile(client_df: pd.DataFrame, internal_df: pd.DataFrame, threshold: float = 0.8,
+              workers: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Perform deterministic + fuzzy matching.
+    `workers` is passed through to fuzzy_match.
     Returns:
         all_matches, unmatched_client, unmatched_internal
     """
     if client_df.empty or internal_df.empty:
         raise ValueError("One or both input DataFrames are empty.")
 
-    logger.info(f"Reconciling datasets: client({len(client_df)}) vs internal({len(internal_df)})")
+    logger.info("Reconciling datasets: client(%d) vs internal(%d)", len(client_df), len(internal_df))
 
-    client_df = client_df.copy()
-    internal_df = internal_df.copy()
-    client_df["site"] = client_df["site"].apply(_normalize)
-    internal_df["site"] = internal_df["site"].apply(_normalize)
+    # assign() returns new frames sharing every column except site, so the
+    # callers' frames are left untouched without a full copy.
+    # map() on a categorical only normalizes each distinct category once
+    client_df = client_df.assign(site=client_df["site"].map(_normalize))
+    internal_df = internal_df.assign(site=internal_df["site"].map(_normalize))
 
     possible_keys = ["job_date", "site", "service_type"]
     join_keys = [k for k in possible_keys if k in client_df.columns and k in internal_df.columns]
     if not join_keys:
         raise ValueError("No overlapping columns for matching found between datasets.")
+    client_df, internal_df = _align_categories(client_df, internal_df, [k for k in join_keys if k != "job_date"])
 
     det_matched = deterministic_match(client_df, internal_df, join_keys)
 
     unmatched_client = get_unmatched(client_df, det_matched, join_keys)
     unmatched_internal = get_unmatched(internal_df, det_matched, join_keys)
-    fuzzy_matched = fuzzy_match(unmatched_client, unmatched_internal, threshold)
-
-    all_matches = pd.concat([det_matched, fuzzy_matched], ignore_index=True)
-
-    matched_client_ids = all_matches.get("order_id", pd.Series(dtype=object)).dropna().unique().tolist()
-    matched_internal_ids = all_matches.get("job_id", pd.Series(dtype=object)).dropna().unique().tolist()
-
-    client_unmatched = client_df[~client_df.get("order_id", pd.Series(dtype=object)).isin(matched_client_ids)].reset_index(drop=True)
-    internal_unmatched = internal_df[~internal_df.get("job_id", pd.Series(dtype=object)).isin(matched_internal_ids)].reset_index(drop=True)
-
-    logger.info(f"Total matches: {len(all_matches)} | Unmatched client: {len(client_unmatched)} | Unmatched internal: {len(internal_unmatched)}")
+    # Nothing left to pair on one side (e.g. everything matched exactly): skip fuzzy
+    if unmatched_client.empty or unmatched_internal.empty:
+        logger.info("Fuzzy matching skipped: no unmatched records left on one side.")
+        all_matches = det_matched.reset_index(drop=True)
+    else:
+        fuzzy_matched = fuzzy_match(unmatched_client, unmatched_internal, threshold, workers)
+        # An empty fuzzy result carries its own schema; only concat real matches
+        frames = [det_matched] + ([fuzzy_matched] if not fuzzy_matched.empty else [])
+        all_matches = pd.concat(frames, ignore_index=True)
+
+    client_unmatched = _unmatched_by_id(client_df, all_matches, "order_id")
+    internal_unmatched = _unmatched_by_id(internal_df, all_matches, "job_id")
+
+    logger.info(
+        "Total matches: %d | Unmatched client: %d | Unmatched internal: %d",
+        len(all_matches), len(client_unmatched), len(internal_unmatched),
+    )
 
     return all_matches, client_unmatched, internal_unmatched
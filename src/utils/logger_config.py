@@ -1,7 +1,9 @@
 # utils/logger_config.py
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # Create logs directory if missing
 LOG_DIR = "logs"
@@ -9,30 +11,40 @@ os.makedirs(LOG_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
 
+# The formatter never prints thread/process fields, so skip collecting them per record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 # Common formatter
 FORMATTER = logging.Formatter(
     fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S"
 )
 
+# Console output (for Streamlit/log viewer)
+_console_handler = logging.StreamHandler()
+_console_handler.setFormatter(FORMATTER)
+
+# Rotating file output
+_file_handler = RotatingFileHandler(
+    LOG_FILE, maxBytes=2_000_000, backupCount=5, encoding="utf-8"
+)
+_file_handler.setFormatter(FORMATTER)
+
+# Loggers only enqueue records; a background thread does the console/file I/O
+_log_queue = queue.Queue(-1)
+_listener = QueueListener(_log_queue, _console_handler, _file_handler, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
+
 def get_logger(name: str) -> logging.Logger:
     """Returns a shared logger configured for the entire app."""
     logger = logging.getLogger(name)
 
     if not logger.hasHandlers():  # Avoid duplicate handlers in Streamlit reruns
         logger.setLevel(logging.INFO)
-
-        # Console output (for Streamlit/log viewer)
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(FORMATTER)
-
-        # Rotating file output
-        file_handler = RotatingFileHandler(
-            LOG_FILE, maxBytes=2_000_000, backupCount=5, encoding="utf-8"
-        )
-        file_handler.setFormatter(FORMATTER)
-
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+        logger.addHandler(QueueHandler(_log_queue))
 
     return logger
@@ -39,6 +39,14 @@ def test_resolve_revenue_columns_detects_columns(matched_df):
     assert internal_col in ["revenue_internal", "revenue_internal"]
 
 
+def test_resolve_revenue_columns_leaves_frame_untouched(matched_df):
+    assert _resolve_revenue_columns(matched_df) == ("amount_client", "revenue_internal")
+    assert matched_df.attrs == {}
+    # Columns added later are picked up on the next call
+    extended = matched_df.assign(revenue_adj_internal=matched_df["revenue_internal"])
+    assert _resolve_revenue_columns(extended) == ("amount_client", "revenue_adj_internal")
+
+
 def test_resolve_revenue_columns_missing_columns():
     df = pd.DataFrame([{"job_date": "2025-10-01"}])
     with pytest.raises(KeyError):
@@ -62,6 +70,40 @@ def test_calculate_revenue_variance_basic(matched_df):
 
 
 
+def test_calculate_revenue_variance_leaves_input_untouched(matched_df):
+    original = matched_df.copy()
+    calculate_revenue_variance(matched_df, tolerance=1.0)
+    pd.testing.assert_frame_equal(matched_df, original)
+
+
+def test_calculate_revenue_variance_runs_in_float32(matched_df):
+    result = calculate_revenue_variance(matched_df, tolerance=1.0)
+    assert result["pct_variance"].dtype == np.float32
+    assert matched_df["amount_client"].dtype == np.float64
+
+
+def test_calculate_revenue_variance_floors_before_float32():
+    # Cast to float32 first, 300000.99 would round up to 300001 and 999999.99 to 1000000
+    df = pd.DataFrame({"amount_client": [300000.99, 999999.99], "revenue_internal": [300000.0, 999999.0]})
+    result = calculate_revenue_variance(df, tolerance=1.0)
+    assert result["revenue_delta"].tolist() == [0.0, 0.0]
+
+
+def test_calculate_revenue_variance_large_amounts_stay_float64():
+    # Past 2**24 whole dollars are no longer exact in float32
+    df = pd.DataFrame({"amount_client": [20_000_001.5], "revenue_internal": [20_000_000.0]})
+    result = calculate_revenue_variance(df, tolerance=1.0)
+    assert result["pct_variance"].dtype == np.float64
+    assert result.loc[0, "revenue_delta"] == 1.0
+
+
+def test_calculate_revenue_variance_zero_revenue():
+    df = pd.DataFrame([{"amount_client": 0.4, "revenue_internal": 0.9}])
+    result = calculate_revenue_variance(df, tolerance=1.0)
+    assert result.loc[0, "pct_variance"] == 0
+    assert bool(result.loc[0, "within_tolerance"])
+
+
 def test_calculate_revenue_variance_empty():
     df = pd.DataFrame()
     result = calculate_revenue_variance(df)
@@ -76,6 +118,14 @@ def test_summarize_metrics_basic(matched_df, unmatched_client, unmatched_interna
     assert "within_tolerance_pct" in metrics
 
 
+def test_summarize_metrics_reuses_variance_df(matched_df, unmatched_client, unmatched_internal):
+    variance_df = calculate_revenue_variance(matched_df, tolerance=1.0)
+    expected = summarize_metrics(matched_df, unmatched_client, unmatched_internal, tolerance=1.0)
+    metrics = summarize_metrics(matched_df, unmatched_client, unmatched_internal,
+                                tolerance=1.0, variance_df=variance_df)
+    assert metrics == expected
+
+
 def test_summarize_metrics_empty(unmatched_client, unmatched_internal):
     metrics = summarize_metrics(pd.DataFrame(), unmatched_client, unmatched_internal)
     assert metrics["matched_jobs"] == 0
@@ -97,6 +147,41 @@ def test_detect_anomalies_flags(matched_df):
 
 
 
+def test_detect_anomalies_rate_change_reason_text(matched_df):
+    df = detect_anomalies(matched_df, tolerance=0.5)
+    assert df.loc[0, "anomaly_reason"] == "Client vs Internal revenue differs by 1.00% ($1.0)"
+    assert df.loc[1, "anomaly_reason"] == "Client vs Internal revenue differs by 1.01% ($2.0)"
+
+
+def test_detect_anomalies_none_within_tolerance(matched_df):
+    df = detect_anomalies(matched_df, tolerance=5.0)
+    assert df["anomaly"].isna().all()
+    assert df["anomaly_reason"].isna().all()
+
+
+def test_detect_anomalies_missing_ids(matched_df):
+    df = matched_df.astype({"order_id_client": "float64", "job_id_internal": "float64"})
+    df.loc[0, "order_id_client"] = np.nan
+    df.loc[1, "job_id_internal"] = np.nan
+    result = detect_anomalies(df, tolerance=5.0)
+    assert result["anomaly"].tolist() == ["missing_job", "new_job", None]
+
+
+def test_detect_anomalies_duplicates(matched_df):
+    dup = pd.concat([matched_df, matched_df.iloc[[2]]], ignore_index=True)
+    df = detect_anomalies(dup, tolerance=1.0)
+    assert df["anomaly"].tolist()[2:] == ["duplicate", "duplicate"]
+    assert df.loc[3, "anomaly_reason"] == "Multiple entries for same site/date (2 rows)"
+
+
+def test_detect_anomalies_reuses_variance_df(matched_df):
+    variance_df = calculate_revenue_variance(matched_df, tolerance=1.0)
+    df = detect_anomalies(matched_df, tolerance=1.0, variance_df=variance_df)
+    pd.testing.assert_frame_equal(df, detect_anomalies(matched_df, tolerance=1.0))
+    # The precomputed frame is left untouched
+    assert "anomaly" not in variance_df.columns
+
+
 def test_detect_anomalies_empty():
     df = pd.DataFrame()
     result = detect_anomalies(df)
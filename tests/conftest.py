@@ -1,5 +1,34 @@
 import sys
 import os
+from functools import lru_cache
+
+import pandas as pd
+import pytest
 
 # Add the src folder to sys.path so tests can import modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+
+# Columns behind the fetcher's sample fixtures and their CSV exports
+SAMPLE_COLUMNS = {
+    "client": {"order_id": [1], "job_date": ["2025-10-01"], "site": ["Site A"], "service_type": ["inspection"]},
+    "internal": {"job_id": [101], "job_date": ["2025-10-01"], "site": ["Site A"], "service_type": ["inspection"]},
+}
+
+
+@lru_cache(maxsize=None)
+def _csv_bytes(kind: str) -> bytes:
+    """CSV export of SAMPLE_COLUMNS[kind], serialized once per session."""
+    return pd.DataFrame(SAMPLE_COLUMNS[kind]).to_csv(index=False).encode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def sample_columns():
+    """Columns behind the fetcher's sample frames, per kind ("client" / "internal")."""
+    return SAMPLE_COLUMNS
+
+
+@pytest.fixture(scope="session")
+def csv_bytes():
+    """Serializer returning the cached CSV export for a kind: csv_bytes("client")."""
+    return _csv_bytes
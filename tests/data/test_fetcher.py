@@ -1,99 +1,212 @@
+import types
 import pytest
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from fetcher import load_client_data, load_internal_data, fetch_from_api, _simulate_api_delay
+from data.fetcher import (
+    CLIENT_API_URL,
+    LEDGER_API_URL,
+    load_client_data,
+    load_internal_data,
+    fetch_from_api,
+    source_version,
+    _simulate_api_delay,
+)
+
+# ---------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------
+def _eq(a: pd.DataFrame, b: pd.DataFrame):
+    """Cheap frame equality for the tiny fixtures: columns, dtypes, index and row values."""
+    assert list(a.columns) == list(b.columns)
+    assert a.dtypes.tolist() == b.dtypes.tolist()
+    assert a.index.equals(b.index)
+    assert a.to_dict("records") == b.to_dict("records")
+
 
 # ---------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------
-@pytest.fixture
-def sample_client_df():
-    return pd.DataFrame([
-        {"order_id": 1, "job_date": "2025-10-01", "site": "Site A", "service_type": "inspection"}
-    ])
+@pytest.fixture(scope="session")
+def sample_client_df(sample_columns):
+    return pd.DataFrame(sample_columns["client"])
+
 
+@pytest.fixture(scope="session")
+def sample_internal_df(sample_columns):
+    return pd.DataFrame(sample_columns["internal"])
 
-@pytest.fixture
-def sample_internal_df():
-    return pd.DataFrame([
-        {"job_id": 101, "job_date": "2025-10-01", "site": "Site A", "service_type": "inspection"}
-    ])
+
+@pytest.fixture(scope="session")
+def csv_dir(tmp_path_factory, csv_bytes):
+    """One DATA_DIR stand-in for the session, holding every sample CSV the fetcher reads."""
+    path = tmp_path_factory.mktemp("csvs")
+    for kind, names in {"client": ("client_data.csv", "client_jobs.csv"),
+                        "internal": ("internal_data.csv", "internal_ledger.csv")}.items():
+        for name in names:
+            (path / name).write_bytes(csv_bytes(kind))
+    return path
 
 # ---------------------------------------------------------------------
 # Test fetch_from_api (mocking filesystem)
 # ---------------------------------------------------------------------
-def test_fetch_from_api_success(monkeypatch, tmp_path, sample_client_df):
-    # Create a temporary CSV to simulate API fetch
-    client_csv = tmp_path / "client_data.csv"
-    sample_client_df.to_csv(client_csv, index=False)
-
-    # Patch DATA_DIR to tmp_path
-    monkeypatch.setattr("fetcher.DATA_DIR", tmp_path)
+def test_fetch_from_api_success(monkeypatch, csv_dir, sample_client_df):
+    # Patch DATA_DIR to the staged CSVs to simulate API fetch
+    monkeypatch.setattr("data.fetcher.DATA_DIR", csv_dir)
 
     df = fetch_from_api("https://api.mockclientdata.local/jobs")
-    pd.testing.assert_frame_equal(df, sample_client_df)
+    _eq(df, sample_client_df)
 
 
 def test_fetch_from_api_file_not_found(monkeypatch, tmp_path):
-    monkeypatch.setattr("fetcher.DATA_DIR", tmp_path)
+    monkeypatch.setattr("data.fetcher.DATA_DIR", tmp_path)
     df = fetch_from_api("https://api.mockclientdata.local/jobs")
     assert df.empty
 
 
+def test_source_version_tracks_the_export(monkeypatch, tmp_path, csv_bytes):
+    monkeypatch.setattr("data.fetcher.DATA_DIR", tmp_path)
+    assert source_version(CLIENT_API_URL) is None
+
+    csv_path = tmp_path / "client_data.csv"
+    csv_path.write_bytes(csv_bytes("client"))
+    first = source_version(CLIENT_API_URL)
+    csv_path.write_bytes(csv_bytes("client") * 2)
+    assert source_version(CLIENT_API_URL) not in (None, first)
+    # The ledger endpoint reads its own export
+    assert source_version(LEDGER_API_URL) is None
+
+
 # ---------------------------------------------------------------------
-# Test load_client_data
+# Test load_client_data / load_internal_data
 # ---------------------------------------------------------------------
-def test_load_client_data_api(monkeypatch, sample_client_df):
+LOADERS = {"client": load_client_data, "internal": load_internal_data}
+
+
+@pytest.mark.parametrize("source", ["api", "sample"])
+@pytest.mark.parametrize("kind", ["client", "internal"])
+def test_load_data_via_fetch(monkeypatch, request, kind, source):
+    expected = request.getfixturevalue(f"sample_{kind}_df")
+    loader = LOADERS[kind]
     # Mock fetch_from_api
-    monkeypatch.setattr("fetcher.fetch_from_api", lambda url: sample_client_df)
-    df = load_client_data(source="api")
-    pd.testing.assert_frame_equal(df, sample_client_df)
+    monkeypatch.setattr("data.fetcher.fetch_from_api", lambda url: expected)
+    _eq(loader(source=source), expected)
 
 
-def test_load_client_data_csv(monkeypatch, tmp_path, sample_client_df):
-    # Create a fake CSV file
-    csv_path = tmp_path / "client_jobs.csv"
-    sample_client_df.to_csv(csv_path, index=False)
+@pytest.mark.parametrize("kind", ["client", "internal"])
+def test_load_data_csv(monkeypatch, csv_dir, request, kind):
+    expected = request.getfixturevalue(f"sample_{kind}_df")
+    loader = LOADERS[kind]
+    monkeypatch.setattr("data.fetcher.DATA_DIR", csv_dir)
+    _eq(loader(source="csv"), expected)
+
+
+@pytest.mark.parametrize("kind,csv_name", [("client", "client_jobs.csv"), ("internal", "internal_ledger.csv")])
+def test_load_data_csv_matches_buffered_read(monkeypatch, csv_dir, kind, csv_name):
+    # The memory-mapped read must produce the same frame as a plain buffered read_csv
+    monkeypatch.setattr("data.fetcher.DATA_DIR", csv_dir)
+    _eq(LOADERS[kind](source="csv"), pd.read_csv(csv_dir / csv_name, dtype={"job_date": "str"}))
+
+
+def test_load_data_keeps_revenue_cents(monkeypatch):
+    # Loaders are lossless; whole-dollar flooring happens in the variance math
+    client = pd.DataFrame({"order_id": ["C001"], "amount": [300000.99]})
+    internal = pd.DataFrame({"job_id": ["I1000"], "revenue": [1605.82]})
+    monkeypatch.setattr("data.fetcher.fetch_from_api", lambda url: client.copy())
+    _eq(load_client_data(source="api"), client)
+    monkeypatch.setattr("data.fetcher.fetch_from_api", lambda url: internal.copy())
+    _eq(load_internal_data(source="api"), internal)
 
-    monkeypatch.setattr("fetcher.DATA_DIR", tmp_path)
-    df = load_client_data(source="csv")
-    pd.testing.assert_frame_equal(df, sample_client_df)
 
+# ---------------------------------------------------------------------
+# Test _simulate_api_delay runs without error
+# ---------------------------------------------------------------------
+def test_simulate_api_delay_runs(monkeypatch):
+    # Patch the fetcher's own time reference so the global time module is untouched
+    monkeypatch.setattr("data.fetcher.time", types.SimpleNamespace(sleep=lambda _x: None))
+    _simulate_api_delay()  # Should run without exceptions
 
-def test_load_client_data_sample(monkeypatch, sample_client_df):
-    monkeypatch.setattr("fetcher.fetch_from_api", lambda url: sample_client_df)
-    df = load_client_data(source="sample")
-    pd.testing.assert_frame_equal(df, sample_client_df)
+
+@pytest.mark.parametrize("flag,expected_calls", [(None, 0), ("0", 0), ("1", 1)])
+def test_simulate_api_delay_gated_by_env(monkeypatch, flag, expected_calls):
+    calls = []
+    monkeypatch.setattr("data.fetcher.time", types.SimpleNamespace(sleep=calls.append))
+    if flag is None:
+        monkeypatch.delenv("SIMULATE_API_DELAY", raising=False)
+    else:
+        monkeypatch.setenv("SIMULATE_API_DELAY", flag)
+    _simulate_api_delay()
+    assert len(calls) == expected_calls
 
 
 # ---------------------------------------------------------------------
-# Test load_internal_data
+# Test chunked and cached CSV reads
 # ---------------------------------------------------------------------
-def test_load_internal_data_api(monkeypatch, sample_internal_df):
-    monkeypatch.setattr("fetcher.fetch_from_api", lambda url: sample_internal_df)
-    df = load_internal_data(source="api")
-    pd.testing.assert_frame_equal(df, sample_internal_df)
+def test_fetch_from_api_chunked(monkeypatch, tmp_path):
+    client = pd.DataFrame({"order_id": [1, 2, 3], "job_date": ["2025-10-01"] * 3})
+    client.to_csv(tmp_path / "client_data.csv", index=False)
+    monkeypatch.setattr("data.fetcher.DATA_DIR", tmp_path)
 
+    with fetch_from_api("https://api.mockclientdata.local/jobs", chunksize=2) as reader:
+        chunks = list(reader)
+    assert [len(c) for c in chunks] == [2, 1]
+    _eq(pd.concat(chunks, ignore_index=True), client)
 
-def test_load_internal_data_csv(monkeypatch, tmp_path, sample_internal_df):
-    csv_path = tmp_path / "internal_ledger.csv"
-    sample_internal_df.to_csv(csv_path, index=False)
 
-    monkeypatch.setattr("fetcher.DATA_DIR", tmp_path)
-    df = load_internal_data(source="csv")
-    pd.testing.assert_frame_equal(df, sample_internal_df)
+def _count_parses(monkeypatch):
+    """Wrap the fetcher's whole-file parser (pandas or pyarrow) and record each path it parses."""
+    import data.fetcher as fetcher
 
+    calls, parse = [], fetcher._parse_csv
+    monkeypatch.setattr(fetcher, "_parse_csv", lambda path: calls.append(path) or parse(path))
+    return calls
 
-def test_load_internal_data_sample(monkeypatch, sample_internal_df):
-    monkeypatch.setattr("fetcher.fetch_from_api", lambda url: sample_internal_df)
-    df = load_internal_data(source="sample")
-    pd.testing.assert_frame_equal(df, sample_internal_df)
 
+def test_load_client_data_csv_reuses_parse(monkeypatch, csv_dir, sample_client_df):
+    monkeypatch.setattr("data.fetcher.DATA_DIR", csv_dir)
+
+    first = load_client_data(source="csv")
+    calls = _count_parses(monkeypatch)
+    first["site"] = "mutated"
+    second = load_client_data(source="csv")
+
+    assert calls == []
+    _eq(second, sample_client_df)
+
+
+def test_read_csv_cache_replaces_changed_file(monkeypatch, tmp_path):
+    import data.fetcher as fetcher
+
+    csv_path = tmp_path / "client_jobs.csv"
+    pd.DataFrame({"order_id": [1]}).to_csv(csv_path, index=False)
+    calls = _count_parses(monkeypatch)
+    fetcher._read_csv(csv_path)
+    pd.DataFrame({"order_id": [1, 2]}).to_csv(csv_path, index=False)
+
+    assert len(fetcher._read_csv(csv_path)) == 2
+    assert len(calls) == 2
+    # One entry per file: the earlier version is replaced, not kept alongside
+    key = str(csv_path.resolve())
+    assert sum(key in str(k) for k in fetcher._CSV_CACHE) == 1
+    assert len(fetcher._CSV_CACHE[key][2]) == 2
+
+
+def test_parse_csv_pyarrow_matches_pandas(monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    import data.fetcher as fetcher
+
+    csv_path = tmp_path / "mixed.csv"
+    csv_path.write_text(
+        "order_id,job_date,site,service_type,amount,revenue,notes\n"
+        "1,2025-10-01,None,NA,100,100.5,\n"
+        "2,2025-10-02,Site A,,250,,\n"
+        "3,,null,repair,300,99.25,\n"
+    )
+    arrow_df = fetcher._parse_csv(csv_path)
+    monkeypatch.setattr(fetcher, "pacsv", None)
+    pandas_df = fetcher._parse_csv(csv_path)
+
+    pd.testing.assert_frame_equal(arrow_df, pandas_df)
+    assert arrow_df["amount"].dtype == np.int64
+    assert arrow_df[["site", "service_type"]].isna().sum().tolist() == [2, 2]
 
-# ---------------------------------------------------------------------
-# Test _simulate_api_delay runs without error
-# ---------------------------------------------------------------------
-def test_simulate_api_delay_runs(monkeypatch):
-    # Patch time.sleep to avoid slowing tests
-    monkeypatch.setattr("time.sleep", lambda x: None)
-    _simulate_api_delay()  # Should run without exceptions
@@ -1,8 +1,11 @@
+import logging
 import pytest
 import pandas as pd
 from data.normalizer import (
     _normalize_text,
     _normalize_service_type,
+    _normalize_site_series,
+    _normalize_service_type_series,
     normalize_dataframe,
 )
 
@@ -39,6 +42,25 @@ def test_normalize_service_type(input_type, expected):
     assert _normalize_service_type(input_type) == expected
 
 
+MIXED_VALUES = [" 123 Main St. ", "5th ave", "Hwy 99 Blvd", "Plz Central", "NORMAL TEXT", "  repair  ", 123, None]
+
+
+def test_normalize_site_series_matches_helper():
+    values = pd.Series(MIXED_VALUES, dtype=object)
+    assert _normalize_site_series(values).tolist() == [_normalize_text(v) for v in MIXED_VALUES]
+
+
+def test_normalize_service_type_series_matches_helper():
+    values = pd.Series(MIXED_VALUES, dtype=object)
+    assert _normalize_service_type_series(values).tolist() == [_normalize_service_type(v) for v in MIXED_VALUES]
+
+
+def test_normalize_series_non_string_column_falls_back():
+    values = pd.Series([1, 2])
+    assert _normalize_site_series(values).tolist() == ["", ""]
+    assert _normalize_service_type_series(values).tolist() == ["", ""]
+
+
 # ---------------------------------------------------------------------
 # Tests for normalize_dataframe
 # ---------------------------------------------------------------------
@@ -48,8 +70,8 @@ def test_normalize_dataframe_basic(caplog):
         {"job_date": "2025-10-02", "site": "5th ave", "service_type": "repair"},
     ])
 
-    caplog.set_level("INFO")
-    normalized = normalize_dataframe(df)
+    with caplog.at_level(logging.INFO, logger="data.normalizer"):
+        normalized = normalize_dataframe(df)
 
     # Job date converted to datetime
     assert pd.api.types.is_datetime64_any_dtype(normalized["job_date"])
@@ -62,9 +84,14 @@ def test_normalize_dataframe_basic(caplog):
     assert normalized.loc[0, "service_type"] == "INSPECTION"
     assert normalized.loc[1, "service_type"] == "REPAIR"
 
+    # Low-cardinality text stored as categoricals
+    assert isinstance(normalized["site"].dtype, pd.CategoricalDtype)
+    assert isinstance(normalized["service_type"].dtype, pd.CategoricalDtype)
+
     # Logging captured
-    assert any("Starting normalization" in msg for msg in caplog.messages)
-    assert any("Normalization complete" in msg for msg in caplog.messages)
+    # Match the raw templates so the records never need formatting
+    assert any(r.msg.startswith("Starting normalization") for r in caplog.records)
+    assert any(r.msg.startswith("Normalization complete") for r in caplog.records)
 
 
 def test_normalize_dataframe_empty(caplog):
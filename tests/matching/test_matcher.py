@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 import pandas as pd
 import logging
 from matching.matcher import (
@@ -7,61 +8,131 @@ from matching.matcher import (
     fuzzy_match,
     get_unmatched,
     _similarity,
+    _ratio_many,
+    _similarity_table,
+    _pair_similarity,
+    _block_keys,
     _normalize
 )
+from data.fetcher import _read_csv
 
-@pytest.fixture
-def sample_data():
+@pytest.fixture(scope="session", params=["numpy", "pyarrow"])
+def dtype_backend(request):
+    """Fixture frames use pandas' default dtypes, then again with Arrow-backed dtypes."""
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    return request.param
+
+def _frame(columns: dict, dtype_backend: str) -> pd.DataFrame:
+    """Build a fixture frame with the given dtype backend."""
+    df = pd.DataFrame(columns)
+    return df.convert_dtypes(dtype_backend="pyarrow") if dtype_backend == "pyarrow" else df
+
+@pytest.fixture(scope="session")
+def sample_data(dtype_backend):
     """Provide simple client/internal datasets for testing."""
-    client = pd.DataFrame([
-        {"order_id": 1, "job_date": "2025-10-01", "site": "Alpha Plant", "service_type": "inspection"},
-        {"order_id": 2, "job_date": "2025-10-02", "site": "Beta Plant", "service_type": "repair"},
-        {"order_id": 3, "job_date": "2025-10-03", "site": "Gamma Plant", "service_type": "audit"},
-    ])
-
-    internal = pd.DataFrame([
-        {"job_id": 101, "job_date": "2025-10-01", "site": "Alpha Plant", "service_type": "inspection"},
-        {"job_id": 102, "job_date": "2025-10-02", "site": "Beta Plant", "service_type": "repair"},
-        {"job_id": 103, "job_date": "2025-10-04", "site": "Delta Plant", "service_type": "audit"},
-    ])
+    client = _frame({
+        "order_id": [1, 2, 3],
+        "job_date": ["2025-10-01", "2025-10-02", "2025-10-03"],
+        "site": ["Alpha Plant", "Beta Plant", "Gamma Plant"],
+        "service_type": ["inspection", "repair", "audit"],
+    }, dtype_backend)
+
+    internal = _frame({
+        "job_id": [101, 102, 103],
+        "job_date": ["2025-10-01", "2025-10-02", "2025-10-04"],
+        "site": ["Alpha Plant", "Beta Plant", "Delta Plant"],
+        "service_type": ["inspection", "repair", "audit"],
+    }, dtype_backend)
     return client, internal
 
-@pytest.fixture
-def fuzzy_data():
+FUZZY_COLUMNS = {
+    "client": {
+        "order_id": [1, 2],
+        "job_date": ["2025-10-01", "2025-10-02"],
+        "site": ["Alfa Plant", "Beta Plnt"],
+        "service_type": ["inspection", "repair"],
+    },
+    "internal": {
+        "job_id": [101, 102],
+        "job_date": ["2025-10-01", "2025-10-02"],
+        "site": ["Alpha Plant", "Beta Plant"],
+        "service_type": ["inspection", "repair"],
+    },
+}
+
+def _normalize_sites(df: pd.DataFrame) -> pd.DataFrame:
+    """Strip/lowercase site names the way reconcile does."""
+    return df.assign(site=df["site"].str.strip().str.lower().fillna(""))
+
+@pytest.fixture(scope="session")
+def fuzzy_data(dtype_backend):
     """Data to test fuzzy matching with minor text variations."""
-    client = pd.DataFrame([
-        {"order_id": 1, "job_date": "2025-10-01", "site": "Alfa Plant", "service_type": "inspection"},
-        {"order_id": 2, "job_date": "2025-10-02", "site": "Beta Plnt", "service_type": "repair"},
-    ])
-    internal = pd.DataFrame([
-        {"job_id": 101, "job_date": "2025-10-01", "site": "Alpha Plant", "service_type": "inspection"},
-        {"job_id": 102, "job_date": "2025-10-02", "site": "Beta Plant", "service_type": "repair"},
-    ])
-    return client, internal
+    return _frame(FUZZY_COLUMNS["client"], dtype_backend), _frame(FUZZY_COLUMNS["internal"], dtype_backend)
+
+@pytest.fixture(scope="session")
+def fuzzy_data_normalized(fuzzy_data):
+    """fuzzy_data with site names already stripped/lowercased, as reconcile does before fuzzy matching."""
+    return tuple(_normalize_sites(df) for df in fuzzy_data)
+
+@pytest.fixture(params=["pandas", "polars"])
+def fuzzy_frames(request, fuzzy_data_normalized, tmp_path):
+    """
+    Normalized fuzzy data built with pandas, or built natively as polars frames,
+    exported with polars' CSV writer and read back through the fetcher's loader.
+    """
+    if request.param == "pandas":
+        return fuzzy_data_normalized
+    pl = pytest.importorskip("polars")
+    frames = []
+    for kind, columns in FUZZY_COLUMNS.items():
+        csv_path = tmp_path / f"{kind}.csv"
+        pl.DataFrame(columns).write_csv(csv_path)
+        frames.append(_normalize_sites(_read_csv(csv_path)))
+    return tuple(frames)
 
-@pytest.mark.parametrize(
-    "a,b,expected",
-    [
-        ("alpha", "alpha", 1.0),
-        ("alpha", "alph", pytest.approx(0.89, rel=0.1)),
-        ("", "alpha", 0.0),
-        (None, "alpha", 0.0),
-    ],
+SIMILARITY_CASES = (
+    ("alpha", "alpha", 1.0),
+    ("alpha", "alph", 0.89),
+    ("", "alpha", 0.0),
+    (None, "alpha", 0.0),
 )
-def test_similarity(a, b, expected):
-    assert _similarity(a, b) == pytest.approx(expected, rel=0.1)
-
-@pytest.mark.parametrize(
-    "value,expected",
-    [
-        (" Alpha ", "alpha"),
-        ("BETA", "beta"),
-        (None, ""),
-        (123, ""),
-    ],
+
+def test_similarity():
+    for a, b, expected in SIMILARITY_CASES:
+        assert _similarity(a, b) == pytest.approx(expected, rel=0.1), f"_similarity({a!r}, {b!r})"
+
+def test_pair_similarity_matches_pairwise():
+    client = np.array(["Alpha Plant", "alfa plant", "Beta Plant", "", None, " alpha plant "], dtype=object)
+    internal = np.array(["Alpha Plant", " beta plnt", "", None, "alfa plant"], dtype=object)
+    c_codes, i_codes, table = _similarity_table(client, internal)
+    ci, ii = (idx.ravel() for idx in np.indices((len(client), len(internal))))
+    scores = _pair_similarity(table, c_codes[ci], i_codes[ii])
+    assert scores.tolist() == [_similarity(client[c], internal[i]) for c, i in zip(ci, ii)]
+
+@pytest.mark.parametrize("floor", [0.3, 0.6, 0.9])
+def test_ratio_many_floor_keeps_scores_above_floor_exact(floor):
+    values = ["alpha plant", "alfa plant", "beta plant", "gamma works", "zz"]
+    exact = [_similarity(a, "alpha plant") for a in values]
+    pruned = _ratio_many(values, "alpha plant", floor)
+    for e, p in zip(exact, pruned):
+        assert p == e if e >= floor else e <= p < floor
+
+NORMALIZE_CASES = (
+    (" Alpha ", "alpha"),
+    ("BETA", "beta"),
+    (None, ""),
+    (123, ""),
 )
-def test_normalize(value, expected):
-    assert _normalize(value) == expected
+
+def test_normalize():
+    for value, expected in NORMALIZE_CASES:
+        assert _normalize(value) == expected, f"_normalize({value!r})"
+
+def test_normalize_matches_vectorized_str_ops():
+    values = [" Alpha ", "BETA", None, 123, "  mixed Case  "]
+    vectorized = pd.Series(values, dtype=object).str.strip().str.lower().fillna("")
+    assert vectorized.tolist() == [_normalize(v) for v in values]
 
 def test_deterministic_match_exact(sample_data):
     client, internal = sample_data
@@ -77,15 +148,30 @@ def test_deterministic_match_no_keys(sample_data):
     with pytest.raises(ValueError):
         deterministic_match(client, internal, [])
 
-def test_fuzzy_match_typo_detection(fuzzy_data):
-    client, internal = fuzzy_data
-    client["site"] = client["site"].apply(_normalize)
-    internal["site"] = internal["site"].apply(_normalize)
+def test_fuzzy_match_typo_detection(fuzzy_frames):
+    client, internal = fuzzy_frames
     result = fuzzy_match(client, internal, threshold=0.8)
     assert not result.empty
     assert all(result["match_type"] == "fuzzy")
     assert set(result["order_id"]) == {1, 2}
 
+def test_fuzzy_match_with_blocking(fuzzy_data):
+    client, internal = fuzzy_data
+    unblocked = fuzzy_match(client, internal, threshold=0.8)
+    blocked = fuzzy_match(client, internal, threshold=0.8, block_on=["job_date", "service_type"])
+    assert set(zip(blocked["order_id"], blocked["job_id"])) == set(zip(unblocked["order_id"], unblocked["job_id"]))
+
+def test_fuzzy_match_blocking_excludes_other_service_types(fuzzy_data):
+    client, internal = fuzzy_data
+    client = client.assign(service_type=["repair", "inspection"])
+    assert fuzzy_match(client, internal, threshold=0.5, block_on=["job_date", "service_type"]).empty
+
+def test_fuzzy_match_parallel_matches_sequential(fuzzy_data, monkeypatch):
+    client, internal = fuzzy_data
+    monkeypatch.setattr("matching.matcher.PARALLEL_MIN_PAIRS", 0)
+    client = pd.concat([client, client.assign(site=["Beta Plnt", "Alfa Plant"])], ignore_index=True)
+    pd.testing.assert_frame_equal(fuzzy_match(client, internal, workers=2), fuzzy_match(client, internal))
+
 def test_fuzzy_match_empty_dataframe_returns_empty():
     empty = pd.DataFrame()
     result = fuzzy_match(empty, empty)
@@ -93,10 +179,32 @@ def test_fuzzy_match_empty_dataframe_returns_empty():
 
 def test_fuzzy_match_above_threshold_no_match(sample_data):
     client, internal = sample_data
+    client = client.copy()
     client.loc[0, "site"] = "CompletelyDifferent"
     result = fuzzy_match(client.iloc[[0]], internal, threshold=0.99)
     assert result.empty
 
+def test_block_keys_are_shared_int32_codes():
+    client = pd.to_datetime(pd.Series(["2025-10-01", None, "2025-10-02"]))
+    internal = pd.to_datetime(pd.Series(["2025-10-02", "2025-10-01"]))
+    c_keys, i_keys = _block_keys(client, internal)
+    assert c_keys.dtype == i_keys.dtype == np.int32
+    assert c_keys[1] == -1
+    assert (c_keys[0], c_keys[2]) == (i_keys[1], i_keys[0])
+
+def test_fuzzy_match_no_match_keeps_schema(sample_data):
+    client, internal = sample_data
+    result = fuzzy_match(client.iloc[[2]], internal.iloc[[0]], threshold=0.99)
+    assert result.empty
+    assert list(result.columns) == ["order_id", "job_date", "site", "service_type", "job_id", "confidence", "match_type"]
+
+def test_reconcile_all_deterministic_skips_fuzzy(sample_data, monkeypatch):
+    client, internal = sample_data
+    monkeypatch.setattr("matching.matcher.fuzzy_match", lambda *a, **k: pytest.fail("fuzzy_match called"))
+    all_matches, client_unmatched, _ = reconcile(client.iloc[:2], internal.iloc[:2])
+    assert set(all_matches["match_type"]) == {"deterministic"}
+    assert client_unmatched.empty
+
 def test_get_unmatched_returns_remaining(sample_data):
     client, internal = sample_data
     matched = deterministic_match(client, internal, ["job_date", "site", "service_type"])
@@ -104,21 +212,69 @@ def test_get_unmatched_returns_remaining(sample_data):
     expected_unmatched = set(client["order_id"]) - set(matched["order_id"])
     assert set(unmatched["order_id"]) == expected_unmatched
 
+@pytest.mark.parametrize("join_keys", [["job_date"], ["job_date", "site", "service_type"]])
+def test_get_unmatched_anti_join_keeps_columns_and_resets_index(sample_data, join_keys):
+    client, internal = sample_data
+    matched = deterministic_match(client, internal, join_keys)
+    unmatched = get_unmatched(client, matched, join_keys)
+    assert list(unmatched.columns) == list(client.columns)
+    assert unmatched["order_id"].tolist() == [3]
+    assert unmatched.index.tolist() == [0]
+
 def test_get_unmatched_with_empty_matched(sample_data):
     client, _ = sample_data
     unmatched = get_unmatched(client, pd.DataFrame(), ["job_date"])
-    pd.testing.assert_frame_equal(unmatched, client)
+    # Nothing removed: same rows, in order, with every column kept
+    assert len(unmatched) == len(client)
+    assert unmatched["order_id"].tolist() == client["order_id"].tolist()
+    assert list(unmatched.columns) == list(client.columns)
 
 def test_reconcile_combines_matches(sample_data):
     client, internal = sample_data
     all_matches, client_unmatched, internal_unmatched = reconcile(client, internal, threshold=0.7)
-    assert isinstance(all_matches, pd.DataFrame)
-    assert "confidence" in all_matches.columns
-    assert all(col in all_matches.columns for col in ["match_type", "site"])
-    assert isinstance(client_unmatched, pd.DataFrame)
-    assert isinstance(internal_unmatched, pd.DataFrame)
+    assert {type(x) for x in (all_matches, client_unmatched, internal_unmatched)} == {pd.DataFrame}
+    assert {"confidence", "match_type", "site"}.issubset(all_matches.columns)
     assert len(all_matches) + len(client_unmatched) <= len(client)
 
+def test_reconcile_leaves_inputs_untouched(sample_data):
+    client, internal = sample_data
+    client_before, internal_before = client.copy(), internal.copy()
+    reconcile(client, internal)
+    pd.testing.assert_frame_equal(client, client_before)
+    pd.testing.assert_frame_equal(internal, internal_before)
+
+def test_reconcile_aligns_categorical_keys(sample_data):
+    client, internal = sample_data
+    client = client.astype({"site": "category", "service_type": "category"})
+    internal = internal.astype({"site": "category", "service_type": "category"})
+    all_matches, _, _ = reconcile(client, internal)
+    deterministic = all_matches[all_matches["match_type"] == "deterministic"]
+    assert isinstance(deterministic["site"].dtype, pd.CategoricalDtype)
+    assert set(deterministic["order_id"]) == {1, 2}
+
+def test_reconcile_missing_service_types_do_not_match():
+    # A missing service type on both sides scores as empty, not as "nan" == "nan"
+    client = pd.DataFrame({"order_id": [1], "job_date": ["2025-10-01"], "site": ["Alpha Plant"], "service_type": [None]})
+    internal = pd.DataFrame({"job_id": [101], "job_date": ["2025-10-01"], "site": ["Alpha Plnt"], "service_type": [None]})
+    all_matches, client_unmatched, internal_unmatched = reconcile(client, internal)
+    assert all_matches.empty
+    assert len(client_unmatched) == 1 and len(internal_unmatched) == 1
+
+def test_reconcile_mismatched_key_dtypes_raises(sample_data):
+    # An all-empty column reads as float64; it cannot be aligned or merged with text
+    client, internal = sample_data
+    client = client.assign(service_type=np.nan)
+    with pytest.raises(ValueError):
+        reconcile(client, internal)
+
+
+@pytest.mark.parametrize("id_col", ["order_id", "job_id"])
+def test_reconcile_without_id_columns_raises(sample_data, id_col):
+    client, internal = sample_data
+    client, internal = client.drop(columns=id_col, errors="ignore"), internal.drop(columns=id_col, errors="ignore")
+    with pytest.raises(ValueError, match=id_col):
+        reconcile(client, internal)
+
 def test_reconcile_empty_inputs_raises():
     with pytest.raises(ValueError):
         reconcile(pd.DataFrame(), pd.DataFrame())